@@ -0,0 +1,85 @@
+# test_all_tools.py - exercise every MCP tool once and report pass/fail
+import asyncio, json, sys
+from collections import Counter
+
+# One check per tool. They're all independent HTTP-backed calls, so the
+# harness runs them concurrently and the suite costs max(tool latency)
+# instead of the sum.
+TOOL_CHECKS = [
+    ("get_weather", {"latitude": 40.7128, "longitude": -74.0060}),
+    ("book_recs", {"topic": "mystery", "limit": 2}),
+    ("random_joke", {}),
+    ("random_dog", {}),
+    ("trivia", {}),
+]
+
+async def check_tool(session, tname: str, args: dict) -> str:
+    result = await session.call_tool(tname, args)
+    return result.content[0].text if result.content else result.model_dump_json()
+
+async def run_checks(call) -> bool:
+    """Fan the checks out through `call` (an async (tool, args) -> payload)."""
+    raw = await asyncio.gather(
+        *(call(tname, args) for tname, args in TOOL_CHECKS),
+        return_exceptions=True,
+    )
+    results = []
+    for (tname, args), outcome in zip(TOOL_CHECKS, raw):
+        if isinstance(outcome, BaseException):
+            print(f"✗ {tname}: {outcome}")
+            results.append((tname, False))
+        else:
+            print(f"✓ {tname}: {str(outcome)[:80]}")
+            results.append((tname, True))
+
+    counts = Counter(ok for _, ok in results)  # one pass over the results
+    passed, failed = counts[True], counts[False]
+    print(f"\n{passed} passed, {failed} failed")
+    return failed == 0
+
+async def test_all_tools(server_path: str, rounds: int = 1) -> bool:
+    # Deferred: --in-process runs still import the mcp SDK through
+    # server_fun's FastMCP, but they skip the client-side transport and
+    # session machinery pulled in here
+    import mcp_client
+
+    session = await mcp_client.get_session(server_path)
+    try:
+        tools = await mcp_client.get_tools(session, server_path)
+        print("Connected tools:", [t.name for t in tools])
+        # Repeat rounds reuse the one spawned server and session, so only the
+        # first round pays subprocess + handshake cost
+        ok = True
+        for n in range(rounds):
+            if rounds > 1:
+                print(f"\n--- round {n+1}/{rounds} ---")
+            ok = await run_checks(lambda tname, args: check_tool(session, tname, args)) and ok
+        return ok
+    finally:
+        await mcp_client.aclose(server_path)
+
+async def test_all_tools_inprocess() -> bool:
+    """Call the tool functions directly - no server subprocess, no MCP
+    handshake. Much faster for the plain does-every-API-work check."""
+    import server_fun
+    print("In-process tools:", [tname for tname, _ in TOOL_CHECKS])
+
+    async def call(tname: str, args: dict) -> str:
+        result = await getattr(server_fun, tname)(**args)
+        return json.dumps(result) if isinstance(result, dict) else str(result)
+
+    return await run_checks(call)
+
+if __name__ == "__main__":
+    argv = [a for a in sys.argv[1:] if a != "--in-process"]
+    rounds = 1
+    if "--rounds" in argv:
+        i = argv.index("--rounds")
+        rounds = int(argv[i + 1])
+        del argv[i:i + 2]
+    if "--in-process" in sys.argv[1:]:
+        ok = asyncio.run(test_all_tools_inprocess())
+    else:
+        server_path = argv[0] if argv else "server_fun.py"
+        ok = asyncio.run(test_all_tools(server_path, rounds))
+    sys.exit(0 if ok else 1)